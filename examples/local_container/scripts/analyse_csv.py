@@ -2,7 +2,9 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
-#   "pandas>=2.2.2,<3",
+#   "numpy>=1.26",
+#   "orjson>=3.9",
+#   "pyarrow>=15",
 # ]
 # ///
 
@@ -10,31 +12,131 @@ import os
 import sys
 import json
 import shutil
-from collections import Counter
 
 try:
-    import pandas as pd
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pacsv
 except Exception as e:
-    print("pandas is required: " + str(e))
+    print("numpy and pyarrow are required: " + str(e))
     sys.exit(1)
 
-
-def compute_five_number_summary(series):
-    s = pd.to_numeric(series, errors="coerce").dropna()
-    if s.empty:
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Only these columns are parsed; the rest of the CSV is never materialized.
+COLUMNS = ["latency_ms", "task_type"]
+# The CSV text is parsed in blocks of this many bytes rather than all at once. Memory still
+# grows with the row count: every non-missing latency is kept as a float64 for exact quantiles.
+BLOCK_SIZE = 1 << 26
+# Stats reported by default; BENCHCTL_STATS=min,median,max,count narrows the set.
+STATS = ("min", "p25", "median", "p75", "max", "count")
+# Matched case-insensitively against whitespace-trimmed cells.
+NUMBER_PATTERN = r"^[-+]?((\d+\.?\d*|\.\d+)(e[-+]?\d+)?|inf(inity)?|nan)$"
+
+
+def to_float_array(column):
+    # Every cell takes the same path so its value depends only on its own text;
+    # non-numeric cells become missing values.
+    column = pc.utf8_trim_whitespace(column)
+    numeric = pc.match_substring_regex(column, NUMBER_PATTERN, ignore_case=True)
+    column = pc.cast(pc.if_else(numeric, column, None), pa.float64())
+    return column.to_numpy(zero_copy_only=False)
+
+
+def count_values(column, counts):
+    vc = pc.value_counts(pc.drop_null(column))
+    for value, n in zip(vc.field("values").to_pylist(), vc.field("counts").to_pylist()):
+        counts[value] = counts.get(value, 0) + n
+
+
+def read_columns(csv_path):
+    read_options = pacsv.ReadOptions(block_size=BLOCK_SIZE)
+    convert_options = pacsv.ConvertOptions(
+        include_columns=COLUMNS,
+        include_missing_columns=True,
+        strings_can_be_null=True,
+        # Types are pinned because streaming infers them from the first block only.
+        # latency_ms stays text and is coerced per cell by to_float_array, so a value
+        # parses the same whichever block it lands in.
+        # task_type has only a few distinct values; dictionary-encode it so counting hashes int codes
+        column_types={
+            "latency_ms": pa.string(),
+            "task_type": pa.dictionary(pa.int32(), pa.string()),
+        },
+    )
+    latencies = []
+    task_counts = {}
+    with pacsv.open_csv(csv_path, read_options=read_options, convert_options=convert_options) as reader:
+        for batch in reader:
+            arr = to_float_array(batch.column("latency_ms"))
+            latencies.append(arr[~np.isnan(arr)])
+            count_values(batch.column("task_type"), task_counts)
+    if not latencies:
+        return np.empty(0, dtype=np.float64), task_counts
+    return np.concatenate(latencies), task_counts
+
+
+def requested_stats():
+    raw = os.environ.get("BENCHCTL_STATS", "")
+    stats = {name.strip() for name in raw.split(",") if name.strip()}
+    if not stats:
+        return set(STATS)
+    unknown = stats.difference(STATS)
+    if unknown:
+        print(f"unknown BENCHCTL_STATS entries: {', '.join(sorted(unknown))}; expected a subset of {', '.join(STATS)}")
+        sys.exit(4)
+    return stats
+
+
+def partition_median(arr):
+    # A single partition around the middle, skipping the quartile selections;
+    # even sizes interpolate the way np.quantile does so results match it exactly
+    mid = arr.size // 2
+    if arr.size % 2:
+        return float(np.partition(arr, mid)[mid])
+    part = np.partition(arr, [mid - 1, mid])
+    lo, hi = part[mid - 1], part[mid]
+    return float(hi - (hi - lo) * 0.5)
+
+
+def compute_five_number_summary(arr, stats=STATS):
+    # arr comes from read_columns, which has already dropped missing values
+    if arr.size == 0:
         return {}
-    desc = s.describe(percentiles=[0.25, 0.5, 0.75])
-    return {
-        "min": float(desc["min"]),
-        "p25": float(desc["25%"]),
-        "median": float(desc["50%"]),
-        "p75": float(desc["75%"]),
-        "max": float(desc["max"]),
-        "count": int(desc["count"]),
-    }
+    values = {}
+    # Interpolating between infinite latencies yields nan; that is reported as-is
+    with np.errstate(invalid="ignore"):
+        if "p25" in stats or "p75" in stats:
+            q = np.quantile(arr, [0.25, 0.5, 0.75])
+            values.update({"p25": float(q[0]), "median": float(q[1]), "p75": float(q[2])})
+        elif "median" in stats:
+            values["median"] = partition_median(arr)
+    if "min" in stats:
+        values["min"] = float(arr.min())
+    if "max" in stats:
+        values["max"] = float(arr.max())
+    values["count"] = int(arr.size)
+    return {name: values[name] for name in STATS if name in stats}
+
+
+def print_json(obj):
+    # Both serializers must produce the same bytes; values are plain strings so
+    # there are no float formatting differences to reconcile.
+    if orjson is None:
+        data = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+    else:
+        data = orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    sys.stdout.buffer.write(data)
 
 
 def main():
+    # Validate before reading so a typo does not cost a full pass over the CSV
+    stats = requested_stats()
+
     run_id = os.environ.get("BENCHCTL_RUN_ID")
     run_dir = os.environ.get("BENCHCTL_RUN_DIR")
     output_dir = os.environ.get("BENCHCTL_OUTPUT_DIR")
@@ -48,36 +150,26 @@ def main():
         print(f"load_test_results.csv not found at {csv_path}")
         sys.exit(3)
 
-    df = pd.read_csv(csv_path)
-
-    five_num = {}
-    if "latency_ms" in df.columns:
-        five_num = compute_five_number_summary(df["latency_ms"])
+    latencies, task_counts = read_columns(csv_path)
 
-    most_task = None
-    if "task_type" in df.columns:
-        counts = Counter(df["task_type"].astype(str))
-        if counts:
-            most_task, _ = counts.most_common(1)[0]
+    five_num = compute_five_number_summary(latencies, stats)
+    most_task = max(task_counts, key=task_counts.get) if task_counts else None
 
-    # Prepare metadata as key=value pairs for benchctl edit
+    # Prepare metadata as key=value pairs for benchctl edit; benchctl metadata
+    # values are strings, and str() spells non-finite floats as "inf"/"nan"
     md_pairs = []
-    if five_num:
-        md_pairs.append(("latency_min_ms", str(five_num.get("min"))))
-        md_pairs.append(("latency_p25_ms", str(five_num.get("p25"))))
-        md_pairs.append(("latency_median_ms", str(five_num.get("median"))))
-        md_pairs.append(("latency_p75_ms", str(five_num.get("p75"))))
-        md_pairs.append(("latency_max_ms", str(five_num.get("max"))))
-        md_pairs.append(("latency_count", str(five_num.get("count"))))
+    for name, value in five_num.items():
+        key = "latency_count" if name == "count" else f"latency_{name}_ms"
+        md_pairs.append((key, str(value)))
     if most_task is not None:
         md_pairs.append(("most_common_task_type", str(most_task)))
 
     if not md_pairs:
-        print(json.dumps({}))
+        print_json({})
         return
 
     # Print JSON to stdout for append_metadata
-    print(json.dumps({k: v for k, v in md_pairs}))
+    print_json(dict(md_pairs))
 
 
 if __name__ == "__main__":